@@ -442,6 +442,19 @@ class ConfigDict(dict):
             assert isinstance(value, str)
             return value
 
+    def get_delimited_set(self, key, default=None, delimiter=","):
+        """ Get a delimited list value as a list of unique, stripped items.
+
+        Args:
+            key (str): The config key to read
+            default (str): Raw value to parse if the key is not present
+            delimiter (str): The item delimiter
+
+        Returns:
+            list of str: the items in their original order, without duplicates
+        """
+        return util.parse_delimited_set(self.get_str(key, default), delimiter)
+
     def get_protected_str(self, key, unsecured_key, default=None):
         assert default is None or isinstance(default, str)
 
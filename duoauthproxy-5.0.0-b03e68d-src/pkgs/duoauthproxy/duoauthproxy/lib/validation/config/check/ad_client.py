@@ -1,4 +1,5 @@
-import functools
+from dataclasses import dataclass
+from typing import Optional
 
 from duoauthproxy.lib import const, ip_util, util
 from duoauthproxy.lib.config_error import ConfigError
@@ -30,7 +31,6 @@ def check_ad_client(config, toolbox=STANDARD_CONFIG_TOOLBOX):
     problems = check_required_keys(config, toolbox)
     problems += check_config_values(config, toolbox)
     problems += check_config_dependencies(config, toolbox)
-    problems += check_ineffective_config_for_auth_type(config, toolbox)
 
     return ConfigCheckResult(problems)
 
@@ -92,36 +92,34 @@ def check_config_values(config, toolbox):
     """
     problems = []
     config_test_resolver = base.get_basic_config_resolver(toolbox)
-    config_dict = {
-        "service_account_username": toolbox.test_is_string,
-        "service_account_password": toolbox.test_is_string,
-        "service_account_password_protected": toolbox.test_is_string,
-        "search_dn": toolbox.test_dn,
-        "security_group_dn": toolbox.test_dn,
-        "ldap_filter": toolbox.test_ldap_filter,
-        "timeout": toolbox.test_is_int,
-        "ssl_ca_certs_file": toolbox.test_file_readable,
-        "ssl_verify_hostname": toolbox.test_is_bool,
-        "bind_dn": toolbox.test_dn,
-        "ntlm_domain": toolbox.test_is_string,
-        "ntlm_workstation": toolbox.test_is_string,
-        "port": toolbox.test_valid_port,
-        "transport": functools.partial(
-            toolbox.test_valid_enum, enum=const.AD_TRANSPORTS, transform=str.lower
-        ),
-        "username_attribute": toolbox.test_is_string,
-        "at_attribute": toolbox.test_is_string,
-    }
+    config_test_resolver.update(
+        {
+            "service_account_username": toolbox.test_is_string,
+            "service_account_password": toolbox.test_is_string,
+            "service_account_password_protected": toolbox.test_is_string,
+            "search_dn": toolbox.test_dn,
+            "security_group_dn": toolbox.test_dn,
+            "ldap_filter": toolbox.test_ldap_filter,
+            "timeout": toolbox.test_is_int,
+            "ssl_ca_certs_file": toolbox.test_file_readable,
+            "ssl_verify_hostname": toolbox.test_is_bool,
+            "bind_dn": toolbox.test_dn,
+            "ntlm_domain": toolbox.test_is_string,
+            "ntlm_workstation": toolbox.test_is_string,
+            "port": toolbox.test_valid_port,
+            "transport": base.get_enum_tester(toolbox, const.AD_TRANSPORTS),
+            "username_attribute": toolbox.test_is_string,
+            "at_attribute": toolbox.test_is_string,
+        }
+    )
     if util.is_windows_os():
-        config_dict["auth_type"] = functools.partial(
-            toolbox.test_valid_enum, enum=const.AD_AUTH_TYPES_WIN, transform=str.lower
+        config_test_resolver["auth_type"] = base.get_enum_tester(
+            toolbox, const.AD_AUTH_TYPES_WIN
         )
-        config_test_resolver.update(config_dict)
     else:
-        config_dict["auth_type"] = functools.partial(
-            toolbox.test_valid_enum, enum=const.AD_AUTH_TYPES_NIX, transform=str.lower
+        config_test_resolver["auth_type"] = base.get_enum_tester(
+            toolbox, const.AD_AUTH_TYPES_NIX
         )
-        config_test_resolver.update(config_dict)
     dynamic_test_resolver = {
         "host": toolbox.test_is_string,
     }
@@ -139,50 +137,124 @@ def check_config_values(config, toolbox):
     return problems
 
 
+@dataclass(frozen=True)
+class ParsedAdClientConfig:
+    """ The [ad_client] values the dependency checks need, normalized once """
+
+    # Lowercased values, None if the configured value is invalid. auth_type is
+    # parsed against the Windows auth types, a superset of the *nix ones.
+    transport: Optional[str]
+    auth_type: Optional[str]
+    # ssl_verify_hostname (defaulting to True), None if it's not a boolean
+    verify_hostname: Optional[bool]
+    has_verify_hostname: bool
+    has_ca_certs_file: bool
+    has_bind_dn: bool
+    has_service_account: bool
+
+
+def parse_ad_client_config(config, toolbox):
+    """
+    Parse the values shared by the [ad_client] dependency checks
+
+    Args:
+        config (ConfigDict): The ad_client section config to parse
+        toolbox (ConfigTestToolbox): Toolbox used to execute the tests
+
+    Returns:
+        ParsedAdClientConfig
+    """
+    try:
+        verify_hostname = config.get_bool("ssl_verify_hostname", True)
+    except ConfigError:
+        verify_hostname = None
+
+    return ParsedAdClientConfig(
+        transport=_get_enum_or_none(
+            config, "transport", const.AD_TRANSPORTS, const.AD_TRANSPORT_CLEAR
+        ),
+        auth_type=_get_enum_or_none(
+            config, "auth_type", const.AD_AUTH_TYPES_WIN, const.AD_AUTH_TYPE_NTLM_V2
+        ),
+        verify_hostname=verify_hostname,
+        has_verify_hostname="ssl_verify_hostname" in config,
+        has_ca_certs_file=toolbox.test_config_has_value(config, "ssl_ca_certs_file"),
+        has_bind_dn=toolbox.test_config_has_value(config, "bind_dn"),
+        has_service_account=(
+            toolbox.test_config_has_value(config, "service_account_username")
+            or toolbox.test_config_has_value(config, "service_account_password")
+            or toolbox.test_config_has_value(
+                config, "service_account_password_protected"
+            )
+        ),
+    )
+
+
 def check_config_dependencies(config, toolbox):
     """
-    Validates dependencies between config options within an [ad_client] section
+    Validates dependencies between config options within an [ad_client] section.
+    The section is parsed once and the result shared by the individual checks.
 
     Args:
         config (ConfigDict): The config object to validate dependencies on
         toolbox (ConfigTestToolbox): The toolbox used to execute the tests
 
     Returns:
-
+        list of BaseResult
     """
-    problems = check_valid_cert_for_transport(config, toolbox)
-    problems += check_valid_bind_dn_for_auth_type(config, toolbox)
-    problems += check_hostname_verification(config, toolbox)
+    parsed = parse_ad_client_config(config, toolbox)
+
+    problems = check_valid_cert_for_transport(parsed)
+    problems += check_valid_bind_dn_for_auth_type(parsed)
+    problems += check_hostname_verification(config, parsed)
+    problems += check_ineffective_config_for_auth_type(parsed)
     return problems
 
 
-def check_valid_cert_for_transport(config, toolbox):
+def _get_enum_or_none(config, key, values, default):
+    """
+    Fetch a case-insensitive enum value from the config
+
+    Args:
+        config (ConfigDict): The config object to read from
+        key (str): The key of the enum value
+        values (list): The valid values for the key
+        default (str): The value to use if the key isn't present
+
+    Returns:
+        str: the lowercased value, or None if the value is invalid
+    """
+    try:
+        return config.get_enum(key, values, default, str.lower)
+    except ConfigError:
+        return None
+
+
+def check_valid_cert_for_transport(parsed):
     """
     Checks that a valid value for transport has been provided and that a certs
     file has been specified if required for the configured transport type.
 
     Args:
-        config (ConfigDict): The config object to check
-        toolbox (ConfigTestToolbox): Toolbox used to execute the tests
+        parsed (ParsedAdClientConfig): The parsed config to check
 
     Returns:
         list of BaseResult
     """
     problems = []
-    try:
-        transport_type = config.get_enum(
-            "transport", const.AD_TRANSPORTS, const.AD_TRANSPORT_CLEAR, str.lower
-        )
-        if transport_type in (const.AD_TRANSPORT_LDAPS, const.AD_TRANSPORT_STARTTLS):
-            has_cert = toolbox.test_config_has_value(config, "ssl_ca_certs_file")
-            if config.get_bool("ssl_verify_hostname", True) and not has_cert:
-                problems.append(
-                    UnmetDependency(
-                        message="ssl_ca_certs_file is required "
-                        "for transport type %s" % transport_type
-                    )
+    transport_type = parsed.transport
+    if transport_type in (const.AD_TRANSPORT_LDAPS, const.AD_TRANSPORT_STARTTLS):
+        if parsed.verify_hostname is None:
+            transport_type = None
+        elif parsed.verify_hostname and not parsed.has_ca_certs_file:
+            problems.append(
+                UnmetDependency(
+                    message="ssl_ca_certs_file is required "
+                    "for transport type %s" % transport_type
                 )
-    except ConfigError:
+            )
+
+    if transport_type is None:
         problems.append(
             SkippedTest(test=check_valid_cert_for_transport.__name__, key="transport")
         )
@@ -190,127 +262,99 @@ def check_valid_cert_for_transport(config, toolbox):
     return problems
 
 
-def check_valid_bind_dn_for_auth_type(config, toolbox):
+def check_valid_bind_dn_for_auth_type(parsed):
     """
     Checks that bind_dn has been specified if it's required for the specified
     auth_type.
     Args:
-        config (ConfigDict): The config object to check
-        toolbox (ConfigTestToolbox): Toolbox used to execute the tests
+        parsed (ParsedAdClientConfig): The parsed config to check
 
     Returns:
         list of BaseResult
     """
     problems = []
-    try:
-        if util.is_windows_os():
-            auth_type = config.get_enum(
-                "auth_type",
-                const.AD_AUTH_TYPES_WIN,
-                const.AD_AUTH_TYPE_NTLM_V2,
-                str.lower,
-            )
-        else:
-            auth_type = config.get_enum(
-                "auth_type",
-                const.AD_AUTH_TYPES_NIX,
-                const.AD_AUTH_TYPE_NTLM_V2,
-                str.lower,
-            )
-        has_bind_dn = toolbox.test_config_has_value(config, "bind_dn")
-        if auth_type == const.AD_AUTH_TYPE_PLAIN and not has_bind_dn:
-            problems.append(
-                UnmetDependency(
-                    message="bind_dn is required for " "auth_type %s" % auth_type
-                )
-            )
-    except ConfigError:
+    auth_type = parsed.auth_type
+    if auth_type is None or (
+        not util.is_windows_os() and auth_type not in const.AD_AUTH_TYPES_NIX
+    ):
         problems.append(
             SkippedTest(
                 test=check_valid_bind_dn_for_auth_type.__name__, key="auth_type"
             )
         )
+    elif auth_type == const.AD_AUTH_TYPE_PLAIN and not parsed.has_bind_dn:
+        problems.append(
+            UnmetDependency(
+                message="bind_dn is required for " "auth_type %s" % auth_type
+            )
+        )
 
     return problems
 
 
-def check_ineffective_config_for_auth_type(config, toolbox):
+def check_ineffective_config_for_auth_type(parsed):
     """
     Checks if service_account_username and service_account_password provide when authproxy is SSPI.
     SSPI using windows login credentials so no service account credentials needed
     Args:
-        config (ConfigDict): The config object to check
-        toolbox (ConfigTestToolbox): Toolbox used to execute the tests
+        parsed (ParsedAdClientConfig): The parsed config to check
 
     Returns:
         list of BaseResult
     """
     problems = []
-    try:
-        has_service_account = (
-            toolbox.test_config_has_value(config, "service_account_username")
-            or toolbox.test_config_has_value(config, "service_account_password")
-            or toolbox.test_config_has_value(
-                config, "service_account_password_protected"
-            )
-        )
-
-        auth_type = config.get_enum(
-            "auth_type", const.AD_AUTH_TYPES_WIN, const.AD_AUTH_TYPE_NTLM_V2, str.lower
-        )
-
-        if auth_type == const.AD_AUTH_TYPE_SSPI and has_service_account:
-            problems.append(
-                InsecureConfigItem(
-                    key="service_account_username and/or service_account_password",
-                    condition="in most cases service account credentials are not needed in "
-                    "the configuration file when the authentication type is SSPI. "
-                    "SSPI will instead leverage the local windows "
-                    "login credentials.",
-                )
-            )
-
-    except ConfigError:
+    if parsed.auth_type is None:
         problems.append(
             SkippedTest(
                 test=check_ineffective_config_for_auth_type.__name__, key="auth_type"
             )
         )
+    elif parsed.auth_type == const.AD_AUTH_TYPE_SSPI and parsed.has_service_account:
+        problems.append(
+            InsecureConfigItem(
+                key="service_account_username and/or service_account_password",
+                condition="in most cases service account credentials are not needed in "
+                "the configuration file when the authentication type is SSPI. "
+                "SSPI will instead leverage the local windows "
+                "login credentials.",
+            )
+        )
 
     return problems
 
 
-def check_hostname_verification(config, toolbox):
+def check_hostname_verification(config, parsed):
     """
     Checks that a user has a hostname in configured for their host if they have ssl_verify_hostname
     set to true.
     Args:
         config (ConfigDict): The config object to check
-        toolbox (ConfigTestToolbox): Toolbox used to execute the tests
+        parsed (ParsedAdClientConfig): The parsed config to check
 
     Returns:
         list of BaseResult
     """
     problems = []
-    try:
-        transport_type = config.get_enum(
-            "transport", const.AD_TRANSPORTS, const.AD_TRANSPORT_CLEAR, str.lower
-        )
-
-        if transport_type in const.AD_TRANSPORTS_WITH_SSL:
-            hosts = util.get_dynamic_keys(config, "host")
-            for host in hosts:
-                if ip_util.is_valid_single_ip(config.get_str(host)) and config.get_bool(
-                    "ssl_verify_hostname"
-                ):
-                    problems.append(
-                        IncompatibleValues(
-                            key=host,
-                            type="hostname",
-                            condition="ssl_verify_hostname is enabled",
-                        )
+    skipped = parsed.transport is None
+    if parsed.transport in const.AD_TRANSPORTS_WITH_SSL:
+        hosts = util.get_dynamic_keys(config, "host")
+        for host in hosts:
+            if not ip_util.is_valid_single_ip(config.get_str(host)):
+                continue
+            # ssl_verify_hostname has no default for this check
+            if not parsed.has_verify_hostname or parsed.verify_hostname is None:
+                skipped = True
+                break
+            if parsed.verify_hostname:
+                problems.append(
+                    IncompatibleValues(
+                        key=host,
+                        type="hostname",
+                        condition="ssl_verify_hostname is enabled",
                     )
-    except ConfigError:
+                )
+
+    if skipped:
         problems.append(
             SkippedTest(test=check_hostname_verification.__name__, key="transport")
         )
@@ -1,6 +1,4 @@
 """ Common methods and variables shared by the check modules """
-import functools
-
 from duoauthproxy.lib import util
 from duoauthproxy.lib.validation.config.config_results import (
     DeprecatedKey,
@@ -32,9 +30,26 @@ def get_basic_config_resolver(toolbox):
     }
 
 
+def get_enum_tester(toolbox, enum):
+    """ Return a tester checking that a config value is in enum, ignoring case
+    Args:
+        toolbox (ConfigTestToolbox): Toolbox used to execute the tests
+        enum (list): The enum to check against
+    Returns:
+        callable taking (config, key) like the other toolbox methods
+    """
+    test_valid_enum = toolbox.test_valid_enum
+
+    def test_enum_value(config, key):
+        return test_valid_enum(config, key, enum=enum, transform=str.lower)
+
+    return test_enum_value
+
+
 def get_basic_radius_server_resolver(config, toolbox):
     """ Return a resolver with the shared radius server keys and the right toolbox methods attached
     Args:
+        config (ConfigDict): The config object to check
         toolbox (ConfigTestToolbox): Toolbox used to execute the tests
     Returns:
         dict of config value => toolbox method
@@ -48,9 +63,7 @@ def get_basic_radius_server_resolver(config, toolbox):
             "api_host": toolbox.test_is_string,
             "client": toolbox.test_is_string,
             "api_timeout": toolbox.test_is_positive_int,
-            "failmode": functools.partial(
-                toolbox.test_valid_enum, enum=["safe", "secure"], transform=str.lower
-            ),
+            "failmode": get_enum_tester(toolbox, ["safe", "secure"]),
             "port": toolbox.test_valid_port,
             "interface": toolbox.test_is_valid_single_ip,
             "pass_through_attr_names": toolbox.test_is_string,
@@ -160,10 +173,9 @@ def run_config_value_checks(config, config_test_resolver):
         list of InvalidValues
     """
     problems = []
-    for key in config_test_resolver:
-        if key in config:
-            if not config_test_resolver[key](config, key):
-                problems.append(InvalidValue(key=key, value=config.get(key)))
+    for key, test_value in config_test_resolver.items():
+        if key in config and not test_value(config, key):
+            problems.append(InvalidValue(key=key, value=config[key]))
 
     return problems
 
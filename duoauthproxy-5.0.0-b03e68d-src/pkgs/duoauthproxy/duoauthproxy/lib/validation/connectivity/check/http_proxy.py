@@ -74,7 +74,7 @@ def validate_http_proxy_config(config):
     if "api_host" not in config:
         problems.append(MissingConfigKeyProblem("api_host"))
 
-    for client_ip in util.parse_delimited_set(config.get_str("client_ip", "")):
+    for client_ip in config.get_delimited_set("client_ip", ""):
         is_valid = ip_util.is_valid_ip(client_ip)
         if not is_valid:
             problems.append(InvalidConfigKeyProblem("client_ip", client_ip))
@@ -9,7 +9,7 @@ from twisted.application.service import Service
 from twisted.internet import defer, reactor
 from twisted_connect_proxy.server import ConnectProxy
 
-from duoauthproxy.lib import const, ip_util, log, util
+from duoauthproxy.lib import const, ip_util, log
 
 
 class Module(Service):
@@ -62,7 +62,7 @@ def get_allowed_ip_networks(config):
     """
     client_ips = []
 
-    for ip_string in util.parse_delimited_set(config.get_str("client_ip", "")):
+    for ip_string in config.get_delimited_set("client_ip", ""):
         if ip_util.is_valid_ip(ip_string):
             client_ips.extend(ip_util.get_ip_networks(ip_string))
 
@@ -27,14 +27,13 @@ class Module(ClientModule):
         except ConfigError:
             nas_ip = util.get_authproxy_ip()
 
-        pass_through_attr_names = config.get_str("pass_through_attr_names", "")
-        pass_through_attr_names = pass_through_attr_names.strip()
-        if pass_through_attr_names:
-            self.pass_through_attr_names = util.parse_delimited_set(
-                pass_through_attr_names
-            )
-        else:
-            self.pass_through_attr_names = []
+        self.pass_through_attr_names = config.get_delimited_set(
+            "pass_through_attr_names", ""
+        )
+        # MS-CHAPv2 attributes are always passed through
+        self.pass_through_attr_names_with_ms_chap2 = tuple(
+            self.pass_through_attr_names
+        ) + tuple(MS_CHAP2_RESPONSE_ATTRS)
 
         self.pass_through_all = config.get_bool("pass_through_all", False)
 
@@ -73,12 +72,9 @@ class Module(ClientModule):
             )
 
         if self.pass_through_all:
-            pass_through_attr_names = list(dict(response_packet).keys())
+            pass_through_attr_names = response_packet.keys()
         else:
-            # Always pass through MS-CHAPv2 attributes
-            pass_through_attr_names = (
-                self.pass_through_attr_names + MS_CHAP2_RESPONSE_ATTRS
-            )
+            pass_through_attr_names = self.pass_through_attr_names_with_ms_chap2
 
         result = AuthResult.from_radius_packet(response_packet, pass_through_attr_names)
 
@@ -89,7 +85,7 @@ class Module(ClientModule):
         response_packet = yield self.protocol.radius_proxy(request)
 
         # Copy all the attributes into radius_attrs on the AuthResult; everything's passed through!
-        pass_through_attr_names = list(dict(response_packet).keys())
+        pass_through_attr_names = response_packet.keys()
         auth_result = AuthResult.from_radius_packet(
             response_packet, pass_through_attr_names
         )
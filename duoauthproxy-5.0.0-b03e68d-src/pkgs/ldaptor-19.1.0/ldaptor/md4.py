@@ -27,8 +27,6 @@ implementated based on rfc at http://www.faqs.org/rfcs/rfc1320.html
 from binascii import hexlify
 import struct
 from warnings import warn
-# site
-from ldaptor.compat import b, bytes, bascii_to_str, irange, PYPY
 # local
 __all__ = ["md4"]
 
@@ -36,6 +34,7 @@ __all__ = ["md4"]
 # =============================================================================
 # utils
 # =============================================================================
+# NOTE: md4._process inlines these for speed, they're kept for reference.
 def F(x, y, z):
     return (x & y) | ((~x) & z)
 
@@ -83,137 +82,107 @@ class md4(object):
     name = "md4"
     digest_size = digestsize = 16
 
-    _count = 0  # number of 64-byte blocks processed so far (not including _buf)
-    _state = None  # list of [a,b,c,d] 32 bit ints used as internal register
-    _buf = None  # data processed in 64 byte blocks, this holds leftover from last update
+    # _count - number of 64-byte blocks processed so far (not including _buf)
+    # _state - list of [a,b,c,d] 32 bit ints used as internal register
+    # _buf - bytearray, data processed in 64 byte blocks, this holds leftover from last update
+    __slots__ = ("_count", "_state", "_buf")
 
     def __init__(self, content=None):
         self._count = 0
         self._state = [0x67452301, 0xefcdab89, 0x98badcfe, 0x10325476]
-        self._buf = b('')
+        self._buf = bytearray()
         if content:
             self.update(content)
 
-    # round 1 table - [abcd k s]
-    _round1 = [
-        [0, 1, 2, 3, 0, 3],
-        [3, 0, 1, 2, 1, 7],
-        [2, 3, 0, 1, 2, 11],
-        [1, 2, 3, 0, 3, 19],
-
-        [0, 1, 2, 3, 4, 3],
-        [3, 0, 1, 2, 5, 7],
-        [2, 3, 0, 1, 6, 11],
-        [1, 2, 3, 0, 7, 19],
-
-        [0, 1, 2, 3, 8, 3],
-        [3, 0, 1, 2, 9, 7],
-        [2, 3, 0, 1, 10, 11],
-        [1, 2, 3, 0, 11, 19],
-
-        [0, 1, 2, 3, 12, 3],
-        [3, 0, 1, 2, 13, 7],
-        [2, 3, 0, 1, 14, 11],
-        [1, 2, 3, 0, 15, 19],
-    ]
-
-    # round 2 table - [abcd k s]
-    _round2 = [
-        [0, 1, 2, 3, 0, 3],
-        [3, 0, 1, 2, 4, 5],
-        [2, 3, 0, 1, 8, 9],
-        [1, 2, 3, 0, 12, 13],
-
-        [0, 1, 2, 3, 1, 3],
-        [3, 0, 1, 2, 5, 5],
-        [2, 3, 0, 1, 9, 9],
-        [1, 2, 3, 0, 13, 13],
-
-        [0, 1, 2, 3, 2, 3],
-        [3, 0, 1, 2, 6, 5],
-        [2, 3, 0, 1, 10, 9],
-        [1, 2, 3, 0, 14, 13],
-
-        [0, 1, 2, 3, 3, 3],
-        [3, 0, 1, 2, 7, 5],
-        [2, 3, 0, 1, 11, 9],
-        [1, 2, 3, 0, 15, 13],
-    ]
-
-    # round 3 table - [abcd k s]
-    _round3 = [
-        [0, 1, 2, 3, 0, 3],
-        [3, 0, 1, 2, 8, 9],
-        [2, 3, 0, 1, 4, 11],
-        [1, 2, 3, 0, 12, 15],
-
-        [0, 1, 2, 3, 2, 3],
-        [3, 0, 1, 2, 10, 9],
-        [2, 3, 0, 1, 6, 11],
-        [1, 2, 3, 0, 14, 15],
-
-        [0, 1, 2, 3, 1, 3],
-        [3, 0, 1, 2, 9, 9],
-        [2, 3, 0, 1, 5, 11],
-        [1, 2, 3, 0, 13, 15],
-
-        [0, 1, 2, 3, 3, 3],
-        [3, 0, 1, 2, 11, 9],
-        [2, 3, 0, 1, 7, 11],
-        [1, 2, 3, 0, 15, 15],
-    ]
-
-    def _process(self, block):
+    # precompiled struct formats used per block
+    _unpack_block = staticmethod(struct.Struct("<16I").unpack)
+    _pack_msglen_into = staticmethod(struct.Struct("<2I").pack_into)
+    _pack_state = staticmethod(struct.Struct("<4I").pack)
+
+    # NOTE: every round cycles its steps through the same four register
+    #       rotations ([abcd], [dabc], [cdab], [bcda]) with a fixed shift per
+    #       rotation, so only the message word indices vary. _process runs
+    #       one rotation cycle per entry in these tables.
+
+    # round 1 word indices - shifts 3, 7, 11, 19
+    _round1 = ((0, 1, 2, 3), (4, 5, 6, 7), (8, 9, 10, 11), (12, 13, 14, 15))
+
+    # round 2 word indices - shifts 3, 5, 9, 13
+    _round2 = ((0, 4, 8, 12), (1, 5, 9, 13), (2, 6, 10, 14), (3, 7, 11, 15))
+
+    # round 3 word indices - shifts 3, 9, 11, 15
+    _round3 = ((0, 8, 4, 12), (2, 10, 6, 14), (1, 9, 5, 13), (3, 11, 7, 15))
+
+    def _process(self, block, _round1=_round1, _round2=_round2, _round3=_round3):
         "process 64 byte block"
         # unpack block into 16 32-bit ints
-        X = struct.unpack("<16I", block)
+        X = self._unpack_block(block)
 
-        # clone state
+        # working registers are kept in locals rather than a list
         orig = self._state
-        state = list(orig)
+        a, b, c, d = orig
+        m = MASK_32
 
         # round 1 - F function - (x&y)|(~x & z)
-        for a1, b1, c1, d1, k1, s1 in self._round1:
-            t = (state[a1] + F(state[b1], state[c1], state[d1]) + X[k1]) & MASK_32
-            state[a1] = ((t << s1) & MASK_32) + (t >> (32 - s1))
-
-        # round 2 - G function
-        for a1, b1, c1, d1, k1, s1 in self._round2:
-            t = (state[a1] + G(state[b1], state[c1], state[d1]) + X[k1] + 0x5a827999) & MASK_32
-            state[a1] = ((t << s1) & MASK_32) + (t >> (32 - s1))
+        for k0, k1, k2, k3 in _round1:
+            t = (a + ((b & c) | ((~b) & d)) + X[k0]) & m
+            a = ((t << 3) & m) | (t >> 29)
+            t = (d + ((a & b) | ((~a) & c)) + X[k1]) & m
+            d = ((t << 7) & m) | (t >> 25)
+            t = (c + ((d & a) | ((~d) & b)) + X[k2]) & m
+            c = ((t << 11) & m) | (t >> 21)
+            t = (b + ((c & d) | ((~c) & a)) + X[k3]) & m
+            b = ((t << 19) & m) | (t >> 13)
+
+        # round 2 - G function - (x&y)|(x&z)|(y&z)
+        for k0, k1, k2, k3 in _round2:
+            t = (a + ((b & c) | (b & d) | (c & d)) + X[k0] + 0x5a827999) & m
+            a = ((t << 3) & m) | (t >> 29)
+            t = (d + ((a & b) | (a & c) | (b & c)) + X[k1] + 0x5a827999) & m
+            d = ((t << 5) & m) | (t >> 27)
+            t = (c + ((d & a) | (d & b) | (a & b)) + X[k2] + 0x5a827999) & m
+            c = ((t << 9) & m) | (t >> 23)
+            t = (b + ((c & d) | (c & a) | (d & a)) + X[k3] + 0x5a827999) & m
+            b = ((t << 13) & m) | (t >> 19)
 
         # round 3 - H function - x ^ y ^ z
-        for a1, b1, c1, d1, k1, s1 in self._round3:
-            t = (state[a1] + (state[b1] ^ state[c1] ^ state[d1]) + X[k1] + 0x6ed9eba1) & MASK_32
-            state[a1] = ((t << s1) & MASK_32) + (t >> (32 - s1))
+        for k0, k1, k2, k3 in _round3:
+            t = (a + (b ^ c ^ d) + X[k0] + 0x6ed9eba1) & m
+            a = ((t << 3) & m) | (t >> 29)
+            t = (d + (a ^ b ^ c) + X[k1] + 0x6ed9eba1) & m
+            d = ((t << 9) & m) | (t >> 23)
+            t = (c + (d ^ a ^ b) + X[k2] + 0x6ed9eba1) & m
+            c = ((t << 11) & m) | (t >> 21)
+            t = (b + (c ^ d ^ a) + X[k3] + 0x6ed9eba1) & m
+            b = ((t << 15) & m) | (t >> 17)
 
         # add back into original state
-        for i in irange(4):
-            orig[i] = (orig[i] + state[i]) & MASK_32
+        orig[0] = (orig[0] + a) & m
+        orig[1] = (orig[1] + b) & m
+        orig[2] = (orig[2] + c) & m
+        orig[3] = (orig[3] + d) & m
 
     def update(self, content):
         if not isinstance(content, bytes):
             raise TypeError("expected bytes")
+        # NOTE: hashing straight out of a view over the buffer, rather than
+        #       slicing off a new bytes object for every 64 byte block.
         buf = self._buf
-        if buf:
-            content = buf + content
+        buf += content
+        end = len(buf) - 64
         idx = 0
-        end = len(content)
-        while True:
-            next = idx + 64
-            if next <= end:
-                self._process(content[idx:next])
-                self._count += 1
-                idx = next
-            else:
-                self._buf = content[idx:]
-                return
+        with memoryview(buf) as view:
+            while idx <= end:
+                self._process(view[idx:idx + 64])
+                idx += 64
+        self._count += idx // 64
+        del buf[:idx]
 
     def copy(self):
         other = _builtin_md4()
         other._count = self._count
         other._state = list(self._state)
-        other._buf = self._buf
+        other._buf = bytearray(self._buf)
         return other
 
     def digest(self):
@@ -225,23 +194,27 @@ class md4(object):
         # then 0x00 padding until congruent w/ 56 mod 64 bytes
         # then last 8 bytes = msg length in bits
         buf = self._buf
-        msglen = self._count * 512 + len(buf) * 8
-        block = buf + b('\x80') + b('\x00') * ((119 - len(buf)) % 64) + \
-                struct.pack("<2I", msglen & MASK_32, (msglen >> 32) & MASK_32)
-        if len(block) == 128:
-            self._process(block[:64])
-            self._process(block[64:])
-        else:
-            assert len(block) == 64
-            self._process(block)
+        buflen = len(buf)
+        msglen = self._count * 512 + buflen * 8
+        # buf is always < 64 bytes, so the padded tail is one or two blocks
+        total = 64 if buflen < 56 else 128
+        block = bytearray(total)
+        block[:buflen] = buf
+        block[buflen] = 0x80
+        self._pack_msglen_into(
+            block, total - 8, msglen & MASK_32, (msglen >> 32) & MASK_32)
+        with memoryview(block) as view:
+            self._process(view[:64])
+            if total == 128:
+                self._process(view[64:])
 
         # render digest & restore un-finalized state
-        out = struct.pack("<4I", *self._state)
+        out = self._pack_state(*self._state)
         self._state = orig
         return out
 
     def hexdigest(self):
-        return bascii_to_str(hexlify(self.digest()))
+        return hexlify(self.digest()).decode('ascii')
 
         # ===================================================================
         # eoc
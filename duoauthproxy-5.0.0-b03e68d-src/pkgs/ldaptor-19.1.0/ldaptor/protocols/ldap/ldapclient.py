@@ -15,6 +15,9 @@
 
 """LDAP protocol client"""
 
+import functools
+import itertools
+
 from ldaptor.protocols import pureldap, pureber
 from ldaptor.protocols.ldap import ldaperrors
 
@@ -33,7 +36,13 @@ class LDAPStartTLSBusyError(ldaperrors.LDAPOperationsError):
         ldaperrors.LDAPOperationsError.__init__(self, message=message)
 
     def toWire(self):
-        return b'Cannot STARTTLS while operations on wire: %r' % self.onwire
+        onwire = self.onwire
+        if isinstance(onwire, dict):
+            # Only name a few of the ids; a busy connection can have
+            # thousands of operations, each holding Deferreds and handlers.
+            return b'Cannot STARTTLS while %d operations on wire (ids=%r)' % (
+                len(onwire), list(itertools.islice(onwire, 16)))
+        return b'Cannot STARTTLS while operations on wire: %r' % (onwire,)
 
 
 class LDAPStartTLSInvalidResponseName(ldaperrors.LDAPException):
@@ -45,6 +54,80 @@ class LDAPStartTLSInvalidResponseName(ldaperrors.LDAPException):
         return b'Invalid responseName in STARTTLS response: %r' % (self.responseName, )
 
 
+class _DefaultClientContextFactory(ssl.ClientContextFactory):
+    """
+    ClientContextFactory for STARTTLS without a caller supplied context.
+
+    The stock factory builds a new SSL context on every getContext() call;
+    this one builds it once and shares it between connections.
+    """
+    _context = None
+
+    def getContext(self):
+        if self._context is None:
+            self._context = ssl.ClientContextFactory.getContext(self)
+        return self._context
+
+
+def _handleValue(handler, args, kwargs, msg):
+    return handler(msg.value, *args, **kwargs)
+
+
+def _handleValueAndControls(handler, args, kwargs, msg):
+    return handler(msg.value, msg.controls, *args, **kwargs)
+
+
+class _PendingOp(object):
+    """
+    An operation sent by LDAPClient that is waiting for its response(s).
+
+    A handler is bound to its extra arguments up front, so that handle()
+    can call it with just the response message.
+    """
+    __slots__ = ('d', 'return_controls', 'handler')
+
+    def __init__(self, d, return_controls=False, handler=None,
+                 args=(), kwargs=None):
+        self.d = d
+        self.return_controls = return_controls
+        if handler is not None:
+            if kwargs is None:
+                kwargs = {}
+            if return_controls:
+                handler = functools.partial(
+                    _handleValueAndControls, handler, args, kwargs)
+            else:
+                handler = functools.partial(
+                    _handleValue, handler, args, kwargs)
+        self.handler = handler
+
+
+class _FlatDecoderContext(pureber.BERDecoderContext):
+    """
+    A BER decoder context with its fallback chain merged into one dict.
+
+    Tags resolve with a single lookup instead of walking the fallbacks,
+    with the nearer context winning just as in the chained lookup.
+    """
+
+    def __init__(self, context):
+        chain = []
+        while context is not None:
+            chain.append(context)
+            context = context.fallback
+        identities = {}
+        for c in reversed(chain):
+            identities.update(c.Identities)
+        inherit = chain[0].inherit_context
+        if inherit is not None:
+            inherit = _FlatDecoderContext(inherit)
+        pureber.BERDecoderContext.__init__(self, inherit=inherit)
+        self.Identities = identities
+
+    def lookup_id(self, id):
+        return self.Identities.get(id)
+
+
 class LDAPClient(protocol.Protocol):
     """An LDAP client"""
     debug = False
@@ -52,27 +135,86 @@ class LDAPClient(protocol.Protocol):
     is_logging_insecure = False
     # END EDIT
 
+    # Shared by every STARTTLS that isn't given a context factory, created
+    # on first use. Only touched from the reactor thread.
+    _defaultContextFactory = None
+
     def __init__(self):
         self.onwire = {}
-        self.buffer = b''
+        self.buffer = bytearray()
+        # Size of the incomplete message at the start of the buffer, once
+        # its length octets are in
+        self._frameSize = None
         self.connected = None
+        # True while dataReceived is handing responses to handle()
+        self._dispatching = False
 
-    berdecoder = pureldap.LDAPBERDecoderContext_TopLevel(
+    # The decoder graph is fixed, so it is flattened once here rather than
+    # walking the fallback chains for every tag of every response.
+    berdecoder = _FlatDecoderContext(pureldap.LDAPBERDecoderContext_TopLevel(
         inherit=pureldap.LDAPBERDecoderContext_LDAPMessage(
             fallback=pureldap.LDAPBERDecoderContext(fallback=pureber.BERDecoderContext()),
-            inherit=pureldap.LDAPBERDecoderContext(fallback=pureber.BERDecoderContext())))
+            inherit=pureldap.LDAPBERDecoderContext(fallback=pureber.BERDecoderContext()))))
 
     def dataReceived(self, recd):
-        self.buffer += recd
-        while 1:
-            try:
-                o, bytes = pureber.berDecodeObject(self.berdecoder, self.buffer)
-            except pureber.BERExceptionInsufficientData:
-                o, bytes = None, 0
-            self.buffer = self.buffer[bytes:]
-            if not o:
-                break
-            self.handle(o)
+        # Each complete message is copied out and dropped from the front of
+        # the buffer before it is handled, which is cheap for a bytearray.
+        buffer = self.buffer
+        buffer += recd
+        messageSize = self._messageSize
+        berDecodeObject = pureber.berDecodeObject
+        berdecoder = self.berdecoder
+        handle = self.handle
+        # A handler may feed us more data, so restore rather than reset
+        dispatching, self._dispatching = self._dispatching, True
+        try:
+            while True:
+                size = self._frameSize
+                try:
+                    if size is None:
+                        size = messageSize(buffer)
+                    if size > len(buffer):
+                        # Keep the size, so the reads that complete a large
+                        # message don't parse its header again.
+                        self._frameSize = size
+                        break
+                    o, _ = berDecodeObject(berdecoder, bytes(buffer[:size]))
+                except pureber.BERExceptionInsufficientData:
+                    break
+                self._frameSize = None
+                del buffer[:size]
+                # None is an unknown tag. Don't test the message's truth
+                # value, BERBase.__len__ would re-encode it.
+                if o is None:
+                    break
+                handle(o)
+        finally:
+            self._dispatching = dispatching
+
+    @staticmethod
+    def _messageSize(buffer):
+        """
+        Return the total size of the BER object at the start of C{buffer}.
+
+        @raise pureber.BERExceptionInsufficientData: if the tag and length
+        octets haven't been received yet.
+        """
+        # Read the length octets straight off the buffer rather than through
+        # pureber.berDecodeLength, which slices and ord()s them one by one.
+        if len(buffer) < 2:
+            raise pureber.BERExceptionInsufficientData(2 - len(buffer))
+        length = buffer[1]
+        if length < 0x80:
+            # short form, the common case for LDAP control messages
+            return 2 + length
+        # long form, the low bits count the length octets that follow
+        lenlen = length & 0x7F
+        end = 2 + lenlen
+        if not lenlen or len(buffer) < end:
+            # An indefinite length (0x80) is never complete; LDAP forbids it.
+            raise pureber.BERExceptionInsufficientData(
+                max(end - len(buffer), 1))
+        return end + int.from_bytes(buffer[2:end], 'big')
 
     def connectionMade(self):
         """TCP connection has opened"""
@@ -82,17 +224,16 @@ class LDAPClient(protocol.Protocol):
         """Called when TCP connection has been lost"""
         self.connected = 0
         # notify handlers of operations in flight
-        while self.onwire:
-            k, v = self.onwire.popitem()
-            # DUO EDIT D46273: Remove depenence on specific number of elemnts in items
-            # Change originally made here
-            # https://github.com/tv42/ldaptor/tree/024250a206ea1c10dfee5deb5eb2b7d1a34eecc6
-            # d, _, _, _, _ = v
-            d = v[0]
-            # END EDIT
-            d.errback(reason)
+        pending = list(self.onwire.values())
+        self.onwire.clear()
+        for v in pending:
+            v.d.errback(reason)
 
     def _send(self, op, controls=None):
+        """
+        Wrap op in an LDAPMessage and encode it, returning the message and
+        its wire representation.
+        """
         if not self.connected:
             raise LDAPClientConnectionLostException()
         msg = pureldap.LDAPMessage(op, controls=controls)
@@ -102,7 +243,21 @@ class LDAPClient(protocol.Protocol):
             # END EDIT
             log.msg('C->S %s' % repr(msg))
         assert msg.id not in self.onwire
-        return msg
+        return msg, msg.toWire()
+
+    def _dispatch_send(self, op, controls, handler, args, kwargs,
+                       return_controls):
+        """
+        Send an operation that expects a response and put it on the wire,
+        returning its Deferred.
+        """
+        msg, wire = self._send(op, controls=controls)
+        assert op.needs_answer
+        d = defer.Deferred()
+        self.onwire[msg.id] = _PendingOp(
+            d, return_controls, handler, args, kwargs)
+        self.transport.write(wire)
+        return d
 
     # DUO EDIT D46274: Add support for response handlers
     def send(self, op, controls=None, handler=None, return_controls=False):
@@ -136,16 +291,8 @@ class LDAPClient(protocol.Protocol):
 
         @rtype: Deferred LDAPProtocolResponse
         """
-        msg = self._send(op, controls=controls)
-        assert op.needs_answer
-        d = defer.Deferred()
-        # self.onwire[msg.id] = (d, False, None, None, None)
-        if handler is not None:
-            self.onwire[msg.id] = (d, return_controls, handler, [], {})
-        else:
-            self.onwire[msg.id] = (d, return_controls, None, None, None)
-        self.transport.write(msg.toWire())
-        return d
+        return self._dispatch_send(
+            op, controls, handler, (), None, return_controls)
     # END EDIT
 
     def send_multiResponse(self, op, handler, *args, **kwargs):
@@ -171,12 +318,7 @@ class LDAPClient(protocol.Protocol):
         completes when the first response has been received
         @rtype: Deferred LDAPProtocolResponse
         """
-        msg = self._send(op)
-        assert op.needs_answer
-        d = defer.Deferred()
-        self.onwire[msg.id] = (d, False, handler, args, kwargs)
-        self.transport.write(msg.toWire())
-        return d
+        return self._dispatch_send(op, None, handler, args, kwargs, False)
 
     def send_multiResponse_ex(self, op, controls=None, handler=None, *args, **kwargs):
         """
@@ -204,12 +346,7 @@ class LDAPClient(protocol.Protocol):
         completes when the last response has been received
         @rtype: Deferred LDAPProtocolResponse
         """
-        msg = self._send(op, controls=controls)
-        assert op.needs_answer
-        d = defer.Deferred()
-        self.onwire[msg.id] = (d, True, handler, args, kwargs)
-        self.transport.write(msg.toWire())
-        return d
+        return self._dispatch_send(op, controls, handler, args, kwargs, True)
 
     def send_noResponse(self, op, controls=None):
         """
@@ -219,9 +356,9 @@ class LDAPClient(protocol.Protocol):
         @param op: the operation to send
         @type op: LDAPProtocolRequest
         """
-        msg = self._send(op, controls=controls)
+        msg, wire = self._send(op, controls=controls)
         assert not op.needs_answer
-        self.transport.write(msg.toWire())
+        self.transport.write(wire)
 
     def unsolicitedNotification(self, msg):
         log.msg("Got unsolicited notification: %s" % repr(msg))
@@ -231,35 +368,29 @@ class LDAPClient(protocol.Protocol):
         if self.debug:
             log.msg('C<-S %s' % repr(msg))
 
-        if msg.id == 0:
+        msg_id = msg.id
+        if msg_id == 0:
             self.unsolicitedNotification(msg.value)
         else:
-            d, return_controls, handler, args, kwargs = self.onwire[msg.id]
+            onwire = self.onwire
+            pending = onwire[msg_id]
+            d = pending.d
+            handler = pending.handler
 
             if handler is None:
-                assert (args is None) or (args == ())
-                assert (kwargs is None) or (kwargs == {})
-                if return_controls:
+                # Single response operation, the common case: it's done, so
+                # take it off the wire before handing over the result.
+                del onwire[msg_id]
+                if pending.return_controls:
                     d.callback((msg.value, msg.controls))
                 else:
                     d.callback(msg.value)
-                del self.onwire[msg.id]
-            else:
-                assert args is not None
-                assert kwargs is not None
-                # Return true to mark request as fully handled
-                if return_controls:
-                    if handler(msg.value, msg.controls, *args, **kwargs):
-                        del self.onwire[msg.id]
-                        # DUO EDIT D46274: Add support for response handlers
-                        d.callback(None)
-                        # END EDIT
-                else:
-                    if handler(msg.value, *args, **kwargs):
-                        del self.onwire[msg.id]
-                        # DUO EDIT D46274: Add support for response handlers
-                        d.callback(None)
-                        # END EDIT
+            elif handler(msg):
+                # The handler returned true: the request is fully handled
+                del onwire[msg_id]
+                # DUO EDIT D46274: Add support for response handlers
+                d.callback(None)
+                # END EDIT
 
     def bind(self, dn='', auth=''):
         """
@@ -314,8 +445,15 @@ class LDAPClient(protocol.Protocol):
         complete.
         """
         if ctx is None:
-            ctx = ssl.ClientContextFactory()
-        # we always delay by one event loop iteration to make
+            if LDAPClient._defaultContextFactory is None:
+                LDAPClient._defaultContextFactory = \
+                    _DefaultClientContextFactory()
+            ctx = LDAPClient._defaultContextFactory
+        if not self.onwire and not self._dispatching:
+            # Nothing in flight and not called from a response handler,
+            # so there is nothing to wait for.
+            return defer.maybeDeferred(self._startTLS, ctx)
+        # otherwise delay by one event loop iteration to make
         # sure the previous handler has exited and self.onwire
         # has been cleaned up
         d = defer.Deferred()
@@ -372,17 +372,19 @@ class BERDecoderContext:
                +" inherit="+repr(self.inherit_context) \
                +">"
 
-def berDecodeObject(context, m):
-    """berDecodeObject(context, bytes) -> (berobject, bytesUsed)
+def berDecodeObject(context, m, offset=0):
+    """berDecodeObject(context, bytes, offset=0) -> (berobject, bytesUsed)
+    Decodes the object starting at offset; bytesUsed counts from there.
     berobject may be None.
     """
-    while m:
-        need(m, 2)
-        i = ber2int(m[0:1], signed=0) & (CLASS_MASK | TAG_MASK)
+    while len(m) > offset:
+        need(m, offset + 2)
+        i = ber2int(m[offset:offset + 1], signed=0) & (CLASS_MASK | TAG_MASK)
 
-        length, lenlen = berDecodeLength(m, offset=1)
-        need(m, 1 + lenlen + length)
-        m2 = m[1 + lenlen:1 + lenlen + length]
+        length, lenlen = berDecodeLength(m, offset=offset + 1)
+        start = offset + 1 + lenlen
+        need(m, start + length)
+        m2 = m[start:start + length]
 
         berclass = context.lookup_id(i)
         if berclass:
@@ -408,12 +410,16 @@ def berDecodeMultiple(content, berdecoder):
     BER objects.
     """
     l = []
-    while content:
-        n, bytes = berDecodeObject(berdecoder, content)
+    # Walk content by offset; slicing off each object would copy the
+    # remainder every time, which adds up for long sequences.
+    offset = 0
+    end = len(content)
+    while offset < end:
+        n, bytes = berDecodeObject(berdecoder, content, offset)
         if n is not None:
             l.append(n)
-        assert bytes <= len(content)
-        content = content[bytes:]
+        offset += bytes
+        assert offset <= end
     return l
 
 # TODO unimplemented classes are below:
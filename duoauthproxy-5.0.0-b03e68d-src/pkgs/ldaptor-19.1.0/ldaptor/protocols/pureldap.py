@@ -61,10 +61,18 @@ def utf8_binary_to_wire(self):
     return result
 # XXX END DUO EDIT
 
+# MessageID is INTEGER (0 .. maxInt), with 0 reserved for unsolicited
+# notifications, so wrap back around to 1 after maxInt.
+MAX_LDAP_MESSAGE_ID = 2 ** 31 - 1
+
+
 def alloc_ldap_message_id():
     global next_ldap_message_id
     r = next_ldap_message_id
-    next_ldap_message_id = next_ldap_message_id + 1
+    if r >= MAX_LDAP_MESSAGE_ID:
+        next_ldap_message_id = 1
+    else:
+        next_ldap_message_id = r + 1
     return r
 
 
@@ -50,6 +50,25 @@ class ConnectionLost(unittest.TestCase):
         d2.addCallbacks(testutil.mustRaise, eb)
         return defer.DeferredList([d1, d2], fireOnOneErrback=True)
 
+    def test_onwire_cleared_before_errbacks(self):
+        """
+        Errbacks of operations in flight see no operations left on the wire.
+        """
+        c = ldapclient.LDAPClient()
+        c.makeConnection(proto_helpers.StringTransport())
+        d1 = c.send(SillyMessage('foo'))
+        d2 = c.send(SillyMessage('bar'))
+        seen = []
+
+        def eb(fail):
+            fail.trap(SillyError)
+            seen.append(dict(c.onwire))
+
+        d1.addErrback(eb)
+        d2.addErrback(eb)
+        c.connectionLost(SillyError())
+        self.assertEqual([{}, {}], seen)
+
 
 class SendTests(unittest.TestCase):
 
@@ -166,6 +185,52 @@ class SendTests(unittest.TestCase):
         d.addErrback(cb_)
         return d
 
+    def test_TLS_default_context_shared(self):
+        """
+        STARTTLS without a context factory reuses a single default context.
+        """
+        self.patch(ldapclient.LDAPClient, '_defaultContextFactory', None)
+        clock = Clock()
+        ldapclient.reactor = clock
+        factories = []
+        for _ in range(2):
+            client, transport = self.create_test_client()
+            client._startTLS = factories.append
+            client.startTLS()
+        clock.advance(1)
+        self.assertIs(factories[0], factories[1])
+        self.assertIs(factories[0].getContext(), factories[1].getContext())
+
+    def test_TLS_idle_sent_immediately(self):
+        """
+        STARTTLS on an idle connection is sent without waiting for the
+        reactor.
+        """
+        clock = Clock()
+        ldapclient.reactor = clock
+        client, transport = self.create_test_client()
+        client.startTLS()
+        expected_value = pureldap.LDAPMessage(pureldap.LDAPStartTLSRequest())
+        expected_value.id -= 1
+        self.assertEqual(
+            transport.value(),
+            expected_value.toWire())
+        self.assertEqual([], clock.getDelayedCalls())
+
+    def test_TLS_busy(self):
+        """
+        STARTTLS while another operation is in flight is delayed by one
+        reactor iteration, and then fails if the operation is still busy.
+        """
+        clock = Clock()
+        ldapclient.reactor = clock
+        client, transport = self.create_test_client()
+        client.send(self.create_test_search_req())
+        d = client.startTLS()
+        self.assertNoResult(d)
+        clock.advance(0)
+        self.failureResultOf(d, ldapclient.LDAPStartTLSBusyError)
+
     def test_unsolicited(self):
         client, transport = self.create_test_client()
         response = pureldap.LDAPMessage(
@@ -233,6 +298,135 @@ class SendTests(unittest.TestCase):
             response.value,
             results[1])
 
+    def test_dataReceived_partial_and_multiple(self):
+        """
+        Responses may be split over several reads, and several responses
+        may arrive in a single read.
+        """
+        client, transport = self.create_test_client()
+        op = self.create_test_search_req()
+        results = []
+
+        def collect_result_(result):
+            results.append(result)
+            return isinstance(result, pureldap.LDAPSearchResultDone)
+
+        client.send_multiResponse(op, collect_result_)
+        msg_id = pureldap.LDAPMessage(op).id - 1
+        entries = [
+            pureldap.LDAPMessage(
+                pureldap.LDAPSearchResultEntry(
+                    "cn=foo%d,ou=baz,dc=example,dc=net" % i, {}),
+                id=msg_id)
+            for i in range(3)]
+        done = pureldap.LDAPMessage(pureldap.LDAPSearchResultDone(0), id=msg_id)
+
+        first = entries[0].toWire()
+        for i in range(len(first)):
+            client.dataReceived(first[i:i + 1])
+        self.assertEqual(1, len(results))
+
+        rest = b''.join(m.toWire() for m in entries[1:] + [done])
+        client.dataReceived(rest[:-3])
+        self.assertEqual(3, len(results))
+        client.dataReceived(rest[-3:])
+
+        self.assertEqual(
+            [m.value for m in entries + [done]],
+            results)
+        self.assertEqual(b'', bytes(client.buffer))
+        self.assertEqual({}, client.onwire)
+
+    def test_dataReceived_does_not_reencode(self):
+        """
+        Received responses are handed over without being encoded again.
+        """
+        client, transport = self.create_test_client()
+        op = self.create_test_search_req()
+        d = client.send(op)
+        response = pureldap.LDAPMessage(
+            pureldap.LDAPSearchResultDone(0),
+            id=pureldap.LDAPMessage(op).id - 1)
+        wire = response.toWire()
+
+        def toWire(self):
+            raise AssertionError("response was re-encoded")
+
+        self.patch(pureldap.LDAPMessage, 'toWire', toWire)
+        client.dataReceived(wire)
+
+        self.assertEqual(response.value, self.successResultOf(d))
+
+    def test_dataReceived_size_kept_across_reads(self):
+        """
+        Once the length of an incomplete response is known it is kept
+        until the rest has arrived.
+        """
+        client, transport = self.create_test_client()
+        op = self.create_test_search_req()
+        d = client.send(op)
+        msg_id = pureldap.LDAPMessage(op).id - 1
+        response = pureldap.LDAPMessage(
+            pureldap.LDAPSearchResultDone(0, errorMessage='x' * 300),
+            id=msg_id)
+        wire = response.toWire()
+
+        client.dataReceived(wire[:2])
+        self.assertIsNone(client._frameSize)
+        client.dataReceived(wire[2:10])
+        self.assertEqual(len(wire), client._frameSize)
+        client.dataReceived(wire[10:])
+
+        self.assertIsNone(client._frameSize)
+        self.assertEqual(response.value, self.successResultOf(d))
+
+    def test_dataReceived_reentrant(self):
+        """
+        A handler may feed the client more data, each response is still
+        handled once and in order.
+        """
+        client, transport = self.create_test_client()
+        op = self.create_test_search_req()
+        results = []
+
+        def handler(result):
+            results.append(result)
+            if len(results) == 1:
+                client.dataReceived(responses[2].toWire())
+            return isinstance(result, pureldap.LDAPSearchResultDone)
+
+        client.send_multiResponse(op, handler)
+        msg_id = pureldap.LDAPMessage(op).id - 1
+        responses = [
+            pureldap.LDAPMessage(
+                pureldap.LDAPSearchResultEntry(
+                    "cn=foo%d,ou=baz,dc=example,dc=net" % i, {}),
+                id=msg_id)
+            for i in range(2)]
+        responses.append(
+            pureldap.LDAPMessage(pureldap.LDAPSearchResultDone(0), id=msg_id))
+        client.dataReceived(responses[0].toWire() + responses[1].toWire())
+
+        self.assertEqual([m.value for m in responses], results)
+        self.assertEqual(b'', bytes(client.buffer))
+        self.assertEqual({}, client.onwire)
+
+    def test_send_response_off_wire(self):
+        """
+        A single response operation is no longer on the wire by the time
+        its result is delivered.
+        """
+        client, transport = self.create_test_client()
+        op = self.create_test_search_req()
+        d = client.send(op)
+        response = pureldap.LDAPMessage(
+            pureldap.LDAPSearchResultDone(0),
+            id=pureldap.LDAPMessage(op).id - 1)
+        onwire = []
+        d.addCallback(lambda _: onwire.append(dict(client.onwire)))
+        client.dataReceived(response.toWire())
+        self.assertEqual([{}], onwire)
+
     def test_send_multiResponse_ex(self):
         client, transport = self.create_test_client()
         op = self.create_test_search_req()
@@ -261,6 +455,46 @@ class SendTests(unittest.TestCase):
         client.send_noResponse(op)
 
 
+class FlatDecoderContextTests(unittest.TestCase):
+    """
+    Tests for the flattened decoder context used by LDAPClient.
+    """
+
+    def test_lookup_matches_chain(self):
+        """
+        Every tag resolves to the same class as through the fallback chain,
+        at each inherit level.
+        """
+        chained = pureldap.LDAPBERDecoderContext_TopLevel(
+            inherit=pureldap.LDAPBERDecoderContext_LDAPMessage(
+                fallback=pureldap.LDAPBERDecoderContext(
+                    fallback=pureber.BERDecoderContext()),
+                inherit=pureldap.LDAPBERDecoderContext(
+                    fallback=pureber.BERDecoderContext())))
+        flat = ldapclient._FlatDecoderContext(chained)
+        for _ in range(3):
+            for tag in range(256):
+                self.assertIs(chained.lookup_id(tag), flat.lookup_id(tag))
+            chained, flat = chained.inherit(), flat.inherit()
+        self.assertIs(flat, flat.inherit())
+
+    def test_decode_response(self):
+        """
+        A response decodes the same through the flattened context.
+        """
+        response = pureldap.LDAPMessage(
+            pureldap.LDAPSearchResultEntry(
+                objectName='cn=foo,dc=example,dc=com',
+                attributes=[('cn', ['foo'])]),
+            controls=[('1.2.3.4', None, None)],
+            id=1)
+        wire = response.toWire()
+        o, used = pureber.berDecodeObject(
+            ldapclient.LDAPClient.berdecoder, wire)
+        self.assertEqual(len(wire), used)
+        self.assertEqual(wire, o.toWire())
+
+
 class RepresentationTests(unittest.TestCase):
     """
     Tests that center on correct representations of objects.
@@ -275,6 +509,13 @@ class RepresentationTests(unittest.TestCase):
         expected_value = b"Cannot STARTTLS while operations on wire: 'xyzzy'"
         self.assertEqual(expected_value, error.toWire())
 
+    def test_startTLSBusyError_onwire_rep(self):
+        onwire = dict((i, object()) for i in range(1, 101))
+        error = ldapclient.LDAPStartTLSBusyError(onwire)
+        expected_value = (b"Cannot STARTTLS while 100 operations on wire "
+                          b"(ids=%r)" % (list(range(1, 17)),))
+        self.assertEqual(expected_value, error.toWire())
+
     def test_StartTLSInvalidResponseName_rep(self):
         error = ldapclient.LDAPStartTLSInvalidResponseName("xyzzy")
         expected_value = b"Invalid responseName in STARTTLS response: 'xyzzy'"
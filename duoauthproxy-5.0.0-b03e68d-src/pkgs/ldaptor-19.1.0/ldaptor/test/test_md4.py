@@ -0,0 +1,83 @@
+"""
+Test cases for the ldaptor.md4 module.
+"""
+
+from twisted.trial import unittest
+from ldaptor import md4
+
+
+class _MD4TestsMixin(object):
+    """
+    Known answer tests shared by all md4 implementations.
+    """
+    # RFC 1320 section A.5 test suite
+    knownValues = [ # message, expected_result
+        (b'', '31d6cfe0d16ae931b73c59d7e0c089c0'),
+        (b'a', 'bde52cb31de33e46245e05fbdbd6fb24'),
+        (b'abc', 'a448017aaf21d8525fc10ae87aa6729d'),
+        (b'message digest', 'd9130a8164549fe818874806e1c7014b'),
+        (b'abcdefghijklmnopqrstuvwxyz', 'd79e1c308aa5bbcdeea8ed63df412da9'),
+        (b'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789',
+         '043f8582f241db351ce627e153e7f0e4'),
+        (b'1234567890' * 8, 'e33b4ddc9c38f2199c3e7b164fcc0536'),
+    ]
+
+    def testKnownValues(self):
+        """md4(...) gives known results"""
+        self.assertEqual(
+            self.knownValues,
+            [(m, self.md4(m).hexdigest()) for m, _ in self.knownValues]
+        )
+
+    def testDigest(self):
+        """digest() returns the raw 16 byte digest"""
+        h = self.md4(b'abc')
+        self.assertEqual(h.digest(), bytes.fromhex('a448017aaf21d8525fc10ae87aa6729d'))
+        self.assertEqual(h.digest_size, 16)
+
+    def testIncrementalUpdate(self):
+        """update() in chunks gives the same result as a single update"""
+        data = bytes(range(256)) * 3
+        for step in (1, 7, 63, 64, 65, 200):
+            h = self.md4()
+            for i in range(0, len(data), step):
+                h.update(data[i:i + step])
+            self.assertEqual(h.hexdigest(), self.md4(data).hexdigest())
+
+    def testDigestDoesNotFinalize(self):
+        """digest() may be called before further updates"""
+        h = self.md4(b'message ')
+        h.digest()
+        h.update(b'digest')
+        self.assertEqual(h.hexdigest(), 'd9130a8164549fe818874806e1c7014b')
+
+    def testCopy(self):
+        """copy() clones the current state"""
+        h = self.md4(b'abc' * 30)
+        other = h.copy()
+        other.update(b'more')
+        self.assertEqual(h.hexdigest(), self.md4(b'abc' * 30).hexdigest())
+        self.assertEqual(other.hexdigest(),
+                         self.md4(b'abc' * 30 + b'more').hexdigest())
+
+
+class TestBuiltinMD4(_MD4TestsMixin, unittest.TestCase):
+    """
+    Unit tests for the pure python md4 implementation.
+    """
+    md4 = staticmethod(md4._builtin_md4)
+
+    def testUpdateRequiresBytes(self):
+        """update() rejects text"""
+        self.assertRaises(TypeError, self.md4().update, u'abc')
+
+
+class TestMD4(_MD4TestsMixin, unittest.TestCase):
+    """
+    Unit tests for md4.new.
+    """
+    md4 = staticmethod(md4.new)
+
+    def testNotHashlib(self):
+        """md4.new is the pure python implementation, FIPS mode refuses md4"""
+        self.assertIs(md4.new, md4._builtin_md4)
@@ -469,3 +469,25 @@ class TestBERSequence(unittest.TestCase):
         self.assertRaises(pureber.BERExceptionInsufficientData, pureber.berDecodeObject, pureber.BERDecoderContext(), m[:2])
         self.assertRaises(pureber.BERExceptionInsufficientData, pureber.berDecodeObject, pureber.BERDecoderContext(), m[:1])
         self.assertEqual((None, 0), pureber.berDecodeObject(pureber.BERDecoderContext(), ''))
+
+    def testDecodeAtOffset(self):
+        """
+        It can be decoded from the middle of a buffer, without counting the
+        bytes before offset as used.
+        """
+        prefix = pureber.BERInteger(7).toWire()
+        m = pureber.BERSequence([pureber.BERInteger(2)]).toWire()
+
+        result, bytes = pureber.berDecodeObject(
+            pureber.BERDecoderContext(), prefix + m, len(prefix))
+
+        self.assertEqual(len(m), bytes)
+        self.assertEqual([pureber.BERInteger(2)], result.data)
+        self.assertRaises(
+            pureber.BERExceptionInsufficientData,
+            pureber.berDecodeObject, pureber.BERDecoderContext(),
+            prefix + m[:4], len(prefix))
+        self.assertEqual(
+            (None, 0),
+            pureber.berDecodeObject(
+                pureber.BERDecoderContext(), prefix, len(prefix)))
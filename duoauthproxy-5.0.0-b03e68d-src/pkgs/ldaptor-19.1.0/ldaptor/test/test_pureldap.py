@@ -721,6 +721,24 @@ class Substrings(unittest.TestCase):
         # when empty, and that tripped e.g. entry.match()
         self.assertEqual(len(filt.substrings), 1)
 
+class TestMessageId(unittest.TestCase):
+    def setUp(self):
+        self.addCleanup(
+            setattr, pureldap, 'next_ldap_message_id',
+            pureldap.next_ldap_message_id)
+
+    def test_sequential(self):
+        """Message ids are allocated sequentially."""
+        first = pureldap.alloc_ldap_message_id()
+        self.assertEqual(first + 1, pureldap.alloc_ldap_message_id())
+
+    def test_wraparound(self):
+        """Message ids wrap back to 1 after maxInt, skipping 0."""
+        pureldap.next_ldap_message_id = pureldap.MAX_LDAP_MESSAGE_ID
+        self.assertEqual(
+            pureldap.MAX_LDAP_MESSAGE_ID, pureldap.alloc_ldap_message_id())
+        self.assertEqual(1, pureldap.alloc_ldap_message_id())
+
 class TestEscaping(unittest.TestCase):
     def test_escape(self):
         s = '\\*()\0'